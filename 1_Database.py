@@ -7,6 +7,8 @@ import pandas as pd
 import sqlite3
 from pathlib import Path
 
+from footer import render_footer
+
 # --------------------
 # Page configuration
 # --------------------
@@ -152,6 +154,53 @@ st.subheader("Filtered Database")
 st.dataframe(display_df, use_container_width=True, hide_index=True)
 
 
+# --------------------
+# Related proteins (precomputed by scripts/cluster.py)
+# --------------------
+@st.cache_data
+def has_related():
+    conn = sqlite3.connect(DB_PATH)
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'protein_similarity'"
+    ).fetchone()
+    conn.close()
+    return row is not None
+
+def load_related(protein_name):
+    # One indexed lookup per selection (primary key on protein_a)
+    conn = sqlite3.connect(DB_PATH)
+    related = pd.read_sql_query(
+        """
+        SELECT
+            s.protein_b AS "Cuticular Protein Name",
+            p.species AS "Species",
+            p.protein_family AS "Protein Family",
+            s.jaccard AS "Similarity (Jaccard)"
+        FROM protein_similarity s
+        JOIN proteins p ON p.name = s.protein_b
+        WHERE s.protein_a = ?
+        ORDER BY s.jaccard DESC
+        """,
+        conn,
+        params=(protein_name,)
+    )
+    conn.close()
+    return related
+
+if has_related() and not filtered_df.empty:
+    st.subheader("Related Proteins")
+    selected_protein = st.selectbox(
+        "Show proteins similar to",
+        filtered_df["Cuticular Protein Name"]
+    )
+    related_df = load_related(selected_protein)
+    if related_df.empty:
+        st.info("No related proteins found for this entry.")
+    else:
+        st.dataframe(related_df, use_container_width=True, hide_index=True)
+        st.caption("Similarity is the Jaccard index of the short amino-acid words (k-mers) two sequences share; values close to 1 indicate near-identical entries.")
+
+
 # --------------------
 # Export logic
 # --------------------
@@ -226,6 +275,5 @@ else:
 # --------------------
 # Footer
 # --------------------
-st.markdown("---")
-st.caption("Cuticulome.db v0.1 | Last updated: February 2026")
+render_footer()
 
@@ -0,0 +1,34 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+import streamlit as st
+
+DB_PATH = Path("cuticulome.db")
+
+# Shown until a release has been recorded with scripts/release.py
+DEFAULT_CAPTION = "Cuticulome.db v0.1 | Last updated: February 2026"
+
+
+@st.cache_data
+def load_latest_release():
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return conn.execute(
+            "SELECT version, created_at FROM releases ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+def render_footer():
+    st.markdown("---")
+    release = load_latest_release()
+    if release is None:
+        st.caption(DEFAULT_CAPTION)
+        return
+    version, created_at = release
+    updated = datetime.fromisoformat(created_at).strftime("%B %Y")
+    st.caption(f"Cuticulome.db v{version} | Last updated: {updated}")
@@ -1,4 +1,5 @@
 import streamlit as st
+from footer import render_footer
 
 st.title("Contact Us")
 
@@ -70,5 +71,4 @@ with col2:
 # --------------------
 # Footer
 # --------------------
-st.markdown("---")
-st.caption("Cuticulome.db v0.1 | Last updated: February 2026")
+render_footer()
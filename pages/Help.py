@@ -1,4 +1,5 @@
 import streamlit as st
+from footer import render_footer
 
 st.title("Understanding the Cuticulome Database")
 
@@ -111,5 +112,4 @@ For questions, suggestions, or to report issues, please visit the [**Contact**](
 # --------------------
 # Footer
 # --------------------
-st.markdown("---")
-st.caption("Cuticulome.db v0.1 | Last updated: February 2026")
+render_footer()
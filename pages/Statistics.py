@@ -1,12 +1,15 @@
 import streamlit as st
 import os
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import sqlite3
 from pathlib import Path
 import re
 
+from footer import render_footer
+
 st.title("Database Statistics")
 
 # ---- Load data from SQLite ----
@@ -117,6 +120,107 @@ if "Protein Family" in df.columns:
 
 st.markdown("---")
 
+# ---- Codon Usage (aggregated by scripts/codon_usage.py) ----
+@st.cache_data
+def load_codon_stats(level):
+    db_path = Path("cuticulome.db")
+    conn = sqlite3.connect(db_path)
+    try:
+        stats = pd.read_sql_query(
+            """
+            SELECT
+                group_name AS "Group",
+                entries AS "Entries",
+                gc AS "GC",
+                gc3 AS "GC3",
+                translation_match AS "Matches",
+                codon_counts
+            FROM cds_group_stats
+            WHERE level = ?
+            ORDER BY entries DESC, group_name
+            """,
+            conn,
+            params=(level,)
+        )
+    except pd.errors.DatabaseError:
+        # Codon analysis has not been run on this database yet
+        return None, None
+    finally:
+        conn.close()
+    counts = np.frombuffer(b"".join(stats.pop("codon_counts")), dtype="<u8").reshape(-1, 64)
+    return stats, counts
+
+codon_totals, _ = load_codon_stats("all")
+
+if codon_totals is not None and not codon_totals.empty:
+    st.subheader("Codon Usage")
+
+    # Same codon order as the stored counts (TTT, TTC, TTA, ... GGG)
+    bases = "TCAG"
+    codons = [a + b + c for a in bases for b in bases for c in bases]
+
+    totals = codon_totals.iloc[0]
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("CDS Analysed", int(totals["Entries"]))
+    with col2:
+        st.metric("GC Content", f"{totals['GC']:.1%}")
+    with col3:
+        st.metric("GC3 Content", f"{totals['GC3']:.1%}")
+    with col4:
+        st.metric("CDS Matching Protein", f"{totals['Matches'] / totals['Entries']:.0%}")
+
+    level = st.selectbox(
+        "Group by",
+        ["Species", "Genus", "Family", "Order", "Class", "Subphylum"],
+        index=3
+    )
+
+    # Groups come sorted by number of CDS; show the top 15
+    group_stats, group_counts = load_codon_stats(level.lower())
+    top_stats = group_stats.head(15).rename(columns={"Group": level})
+    top_groups = top_stats[level]
+    top_counts = group_counts[:len(top_stats)]
+    codons_per_group = top_counts.sum(axis=1, keepdims=True)
+    usage = np.divide(top_counts, codons_per_group, out=np.zeros(top_counts.shape), where=codons_per_group > 0)
+
+    gc_df = top_stats[[level, "GC", "GC3"]].melt(id_vars=level, var_name="Measure", value_name="Content")
+
+    fig_gc = px.bar(
+        gc_df,
+        x=level,
+        y="Content",
+        color="Measure",
+        barmode="group",
+        color_discrete_sequence=["#6baed6", "#08519c"],
+        labels={"Content": "GC Content", level: level}
+    )
+    fig_gc.update_layout(
+        plot_bgcolor="rgba(0,0,0,0)",
+        xaxis_tickangle=-45,
+        yaxis_tickformat=".0%",
+        height=450
+    )
+
+    st.plotly_chart(fig_gc, use_container_width=True)
+
+    fig_usage = px.imshow(
+        usage,
+        x=codons,
+        y=list(top_groups),
+        color_continuous_scale="Blues",
+        aspect="auto",
+        labels={"x": "Codon", "y": level, "color": "Frequency"}
+    )
+    fig_usage.update_layout(height=150 + 25 * len(top_groups))
+
+    st.plotly_chart(fig_usage, use_container_width=True)
+
+    st.caption("GC3 is the GC content at third codon positions. A CDS matches its protein when its translation equals the stored protein sequence.")
+
+    st.markdown("---")
+
 # ---- Publications by Year (from CSV) ----
 st.subheader("Publications by Year")
 
@@ -159,5 +263,4 @@ if os.path.exists(pub_csv):
 # --------------------
 # Footer
 # --------------------
-st.markdown("---")
-st.caption("Cuticulome.db v0.1 | Last updated: February 2026")
+render_footer()
@@ -0,0 +1,396 @@
+"""Integrity audit across the `proteins` table, the `sequences` table,
+`fasta_files/` and `data/clean.csv`.
+
+FASTA files are hashed and validated in a process pool. Results are kept
+in a manifest keyed by file path, size and mtime, so later runs only rehash
+files that changed. The report is written as JSON.
+
+Usage:
+    python scripts/audit.py [--output report.json] [--jobs N] [--strict]
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from common import (
+    CDS_ALPHABET,
+    CLEAN_CSV,
+    CSV_COLUMNS,
+    DB_PATH,
+    FASTA_ROOT,
+    FASTA_SUFFIXES,
+    PROTEIN_ALPHABET,
+    PROTEIN_COLUMNS,
+    REPO_ROOT,
+    connect,
+    iter_sequences,
+    normalize_sequence,
+)
+
+MANIFEST_VERSION = 2
+DEFAULT_MANIFEST = REPO_ROOT / ".audit_manifest.json"
+
+ALPHABETS = {
+    "cds": set(CDS_ALPHABET),
+    "protein": set(PROTEIN_ALPHABET),
+}
+
+def sequence_digest(seq):
+    return hashlib.sha1(seq.encode("ascii", "replace")).hexdigest()
+
+
+def seq_type_of(file_name):
+    for seq_type, suffix in FASTA_SUFFIXES.items():
+        if file_name.endswith(suffix):
+            return seq_type
+    return None
+
+
+# --------------------
+# Per-file scan (runs in worker processes)
+# --------------------
+def scan_file(path):
+    """Hash and validate one FASTA file.
+
+    Returns a JSON-serializable dict; the raw sequence never leaves the
+    worker, only its length and digest.
+    """
+    path = Path(path)
+    stat = path.stat()
+    data = path.read_bytes()
+    result = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "records": 0,
+        "length": 0,
+        "seq_sha1": None,
+        "errors": [],
+    }
+
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        result["errors"].append("not valid UTF-8")
+        return result
+
+    chunks = []
+    orphan_lines = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(">"):
+            result["records"] += 1
+        elif result["records"] == 0:
+            orphan_lines += 1
+        else:
+            chunks.append(line)
+
+    if not text.strip():
+        result["errors"].append("empty file")
+        return result
+    if result["records"] == 0:
+        result["errors"].append("no FASTA header")
+    elif result["records"] > 1:
+        result["errors"].append(f"{result['records']} records, expected 1")
+    if orphan_lines:
+        result["errors"].append("sequence lines before first header")
+
+    seq = normalize_sequence("".join(chunks))
+    result["length"] = len(seq)
+    result["seq_sha1"] = sequence_digest(seq)
+    if not seq:
+        result["errors"].append("empty sequence")
+
+    alphabet = ALPHABETS.get(seq_type_of(path.name))
+    if alphabet is not None:
+        invalid = sorted(set(seq) - alphabet)
+        if invalid:
+            result["errors"].append(f"invalid characters: {''.join(invalid)}")
+
+    return result
+
+
+# --------------------
+# Manifest
+# --------------------
+def load_manifest(path, fasta_root):
+    """Cached file entries, or {} if the manifest belongs to another tree."""
+    if path is None or not path.is_file():
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    # Keys are relative to the FASTA root, so entries from another tree
+    # could match by size and mtime alone
+    if manifest.get("fasta_root") != str(fasta_root.resolve()):
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(path, fasta_root, files):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"version": MANIFEST_VERSION, "fasta_root": str(fasta_root.resolve()), "files": files},
+            f,
+            sort_keys=True,
+        )
+    os.replace(tmp_path, path)
+
+
+def scan_fasta_root(fasta_root, manifest, jobs):
+    """Scan every file under fasta_root, reusing unchanged manifest entries.
+
+    Returns (files, rehashed_count) where files maps a relative path to the
+    scan result.
+    """
+    files = {}
+    stale = []
+    for entry in sorted(fasta_root.rglob("*")):
+        if not entry.is_file():
+            continue
+        rel = entry.relative_to(fasta_root).as_posix()
+        if rel.startswith("."):
+            continue
+        stat = entry.stat()
+        cached = manifest.get(rel)
+        if (
+            cached
+            and cached.get("size") == stat.st_size
+            and cached.get("mtime_ns") == stat.st_mtime_ns
+        ):
+            files[rel] = cached
+        else:
+            stale.append(rel)
+
+    if stale:
+        paths = [str(fasta_root / rel) for rel in stale]
+        if jobs == 1 or len(paths) == 1:
+            results = list(map(scan_file, paths))
+        else:
+            workers = jobs or os.cpu_count() or 1
+            chunksize = max(1, len(paths) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(scan_file, paths, chunksize=chunksize))
+        files.update(zip(stale, results))
+
+    return files, len(stale)
+
+
+# --------------------
+# Cross-checks
+# --------------------
+def check_files(files, issues):
+    for rel, info in files.items():
+        for error in info["errors"]:
+            issues.append({"check": "fasta_invalid", "file": rel, "detail": error})
+
+
+def check_folders(protein_names, files, issues):
+    folders = defaultdict(set)
+    for rel in files:
+        parts = rel.split("/")
+        if len(parts) != 2:
+            issues.append({"check": "unexpected_file", "file": rel})
+            continue
+        folders[parts[0]].add(parts[1])
+
+    for name in sorted(protein_names):
+        if name not in folders:
+            issues.append({"check": "missing_folder", "protein": name})
+            continue
+        for seq_type, suffix in FASTA_SUFFIXES.items():
+            if f"{name}{suffix}" not in folders[name]:
+                issues.append({
+                    "check": "missing_file",
+                    "protein": name,
+                    "file": f"{name}/{name}{suffix}",
+                })
+
+    for folder, names in sorted(folders.items()):
+        if folder not in protein_names:
+            issues.append({"check": "orphan_folder", "file": folder})
+        expected = {f"{folder}{suffix}" for suffix in FASTA_SUFFIXES.values()}
+        for file_name in sorted(names - expected):
+            issues.append({"check": "unexpected_file", "file": f"{folder}/{file_name}"})
+
+
+def check_sequences(conn, protein_names, files, issues):
+    rows = defaultdict(list)
+    for protein_name, seq_type, sequence in iter_sequences(conn):
+        rows[(protein_name, seq_type)].append(sequence)
+
+    for (name, seq_type), seqs in sorted(rows.items(), key=lambda kv: (str(kv[0][0]), str(kv[0][1]))):
+        if name not in protein_names:
+            issues.append({"check": "orphan_sequence_row", "protein": name, "seq_type": seq_type})
+        if seq_type not in FASTA_SUFFIXES:
+            issues.append({"check": "unknown_seq_type", "protein": name, "seq_type": seq_type})
+            continue
+        if len(seqs) > 1:
+            issues.append({
+                "check": "duplicate_sequence_row",
+                "protein": name,
+                "seq_type": seq_type,
+                "detail": f"{len(seqs)} rows",
+            })
+        rel = f"{name}/{name}{FASTA_SUFFIXES[seq_type]}"
+        info = files.get(rel)
+        if info is None:
+            issues.append({"check": "sequence_missing_file", "protein": name, "seq_type": seq_type, "file": rel})
+        elif info["seq_sha1"] is not None and sequence_digest(seqs[0]) != info["seq_sha1"]:
+            issues.append({
+                "check": "sequence_mismatch",
+                "protein": name,
+                "seq_type": seq_type,
+                "file": rel,
+                "detail": f"db length {len(seqs[0])}, file length {info['length']}",
+            })
+
+    for rel in sorted(files):
+        parts = rel.split("/")
+        if len(parts) != 2:
+            continue
+        seq_type = seq_type_of(parts[1])
+        if seq_type and parts[1] == f"{parts[0]}{FASTA_SUFFIXES[seq_type]}":
+            if (parts[0], seq_type) not in rows:
+                issues.append({
+                    "check": "sequence_missing_in_db",
+                    "protein": parts[0],
+                    "seq_type": seq_type,
+                    "file": rel,
+                })
+
+    return sum(len(seqs) for seqs in rows.values())
+
+
+def check_clean_csv(csv_path, db_rows, issues):
+    if not csv_path.is_file():
+        issues.append({"check": "csv_missing", "file": str(csv_path)})
+        return 0
+
+    data = csv_path.read_bytes()
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        issues.append({"check": "csv_encoding", "file": str(csv_path), "detail": str(e)})
+        text = data.decode("cp1252", errors="replace")
+
+    csv_rows = [
+        {CSV_COLUMNS[k]: (v or None) for k, v in row.items() if k in CSV_COLUMNS}
+        for row in csv.DictReader(io.StringIO(text, newline=""))
+    ]
+
+    counts = Counter(row.get("name") for row in csv_rows)
+    for name, count in sorted(counts.items(), key=lambda kv: str(kv[0])):
+        if count > 1:
+            issues.append({"check": "csv_duplicate_name", "protein": name, "detail": f"{count} rows"})
+
+    csv_by_name = {}
+    for row in csv_rows:
+        csv_by_name.setdefault(row.get("name"), row)
+
+    for name in sorted(set(csv_by_name) - set(db_rows), key=str):
+        issues.append({"check": "csv_missing_in_db", "protein": name})
+    for name in sorted(set(db_rows) - set(csv_by_name)):
+        issues.append({"check": "db_missing_in_csv", "protein": name})
+
+    for name in sorted(set(csv_by_name) & set(db_rows)):
+        differing = [
+            col for col in PROTEIN_COLUMNS
+            if (csv_by_name[name].get(col) or None) != (db_rows[name].get(col) or None)
+        ]
+        if differing:
+            issues.append({"check": "csv_field_mismatch", "protein": name, "detail": differing})
+
+    return len(csv_rows)
+
+
+# --------------------
+# Entry point
+# --------------------
+def run_audit(db_path, fasta_root, csv_path, manifest_path, jobs):
+    manifest = load_manifest(manifest_path, fasta_root)
+    files, rehashed = scan_fasta_root(fasta_root, manifest, jobs)
+    if manifest_path is not None and (rehashed or set(manifest) != set(files)):
+        save_manifest(manifest_path, fasta_root, files)
+
+    conn = connect(db_path)
+    try:
+        cursor = conn.execute("SELECT * FROM proteins")
+        columns = [d[0] for d in cursor.description]
+        db_rows = {row[0]: dict(zip(columns, row)) for row in cursor}
+        protein_names = set(db_rows)
+
+        issues = []
+        check_files(files, issues)
+        check_folders(protein_names, files, issues)
+        sequence_rows = check_sequences(conn, protein_names, files, issues)
+        csv_rows = check_clean_csv(csv_path, db_rows, issues)
+    finally:
+        conn.close()
+
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "db": str(db_path),
+        "fasta_root": str(fasta_root),
+        "summary": {
+            "proteins": len(db_rows),
+            "sequence_rows": sequence_rows,
+            "csv_rows": csv_rows,
+            "files": len(files),
+            "files_rehashed": rehashed,
+            "issues": len(issues),
+            "issues_by_check": dict(sorted(Counter(i["check"] for i in issues).items())),
+        },
+        "issues": issues,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--fasta-root", type=Path, default=FASTA_ROOT)
+    parser.add_argument("--csv", type=Path, default=CLEAN_CSV)
+    parser.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST)
+    parser.add_argument("--no-manifest", action="store_true", help="rehash every file and do not write a manifest")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 if any issue is found")
+    args = parser.parse_args(argv)
+
+    manifest_path = None if args.no_manifest else args.manifest
+    report = run_audit(args.db, args.fasta_root, args.csv, manifest_path, args.jobs)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    summary = report["summary"]
+    print(
+        f"{summary['issues']} issue(s) across {summary['proteins']} proteins, "
+        f"{summary['files']} files ({summary['files_rehashed']} rehashed)",
+        file=sys.stderr,
+    )
+    return 1 if args.strict and report["issues"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
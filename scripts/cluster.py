@@ -0,0 +1,334 @@
+"""All-vs-all redundancy and ortholog clustering with MinHash LSH.
+
+Every protein sequence is reduced to its set of k-mers and sketched with
+MinHash. Sketches are bucketed with banded LSH, so only proteins that share
+a bucket are compared. Candidate pairs are verified by their Jaccard
+similarity, and the results are written back to the database:
+
+- `protein_similarity`: verified pairs (both directions), used by the
+  Database page to list related proteins;
+- `protein_clusters`: connected components of the similarity graph, one
+  set for near-identical entries (`redundant`) and one for groups of
+  similar proteins across species (`ortholog`).
+
+Usage:
+    python scripts/cluster.py [--k 4] [--num-perm 128] [--bands 64]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from common import DB_PATH, connect, iter_sequence_arrays
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+BITS_PER_RESIDUE = 5
+
+# Smallest prime above 2**32, for the universal hash (a * x + b) mod p;
+# k-mer codes stay below 2**30 so the product fits in uint64.
+HASH_PRIME = np.uint64(4294967311)
+MAX_K = 6
+
+# Upper bound on elements of the (num_perm, k-mers) hash matrix per chunk
+CHUNK_ELEMENTS = 1 << 23
+
+# Residue byte -> code (1..20); anything else is 0 and breaks k-mers
+RESIDUE_CODES = np.zeros(256, dtype=np.uint64)
+for _i, _aa in enumerate(AMINO_ACIDS, start=1):
+    RESIDUE_CODES[ord(_aa)] = _i
+
+
+# --------------------
+# Database
+# --------------------
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS protein_similarity (
+    protein_a TEXT NOT NULL,
+    protein_b TEXT NOT NULL,
+    jaccard REAL NOT NULL,
+    PRIMARY KEY (protein_a, protein_b),
+    FOREIGN KEY (protein_a) REFERENCES proteins(name),
+    FOREIGN KEY (protein_b) REFERENCES proteins(name)
+);
+CREATE TABLE IF NOT EXISTS protein_clusters (
+    cluster_type TEXT NOT NULL,
+    protein_name TEXT NOT NULL,
+    cluster_id INTEGER NOT NULL,
+    PRIMARY KEY (cluster_type, protein_name),
+    FOREIGN KEY (protein_name) REFERENCES proteins(name)
+);
+CREATE INDEX IF NOT EXISTS idx_protein_clusters_id
+    ON protein_clusters (cluster_type, cluster_id);
+"""
+
+
+def load_proteins(conn):
+    """Return (names, species, sequences) for proteins with a sequence."""
+    species_by_name = dict(conn.execute("SELECT name, species FROM proteins"))
+    names, species, seqs = [], [], []
+    seen = set()
+    for name, _, seq in iter_sequence_arrays(conn, "protein"):
+        if name not in species_by_name or name in seen:
+            continue
+        seen.add(name)
+        names.append(name)
+        species.append(species_by_name[name])
+        seqs.append(seq)
+    return names, species, seqs
+
+
+# --------------------
+# K-mer sets
+# --------------------
+def kmer_sets(seqs, k):
+    """Encode every sequence (uint8 array) into its sorted set of k-mer codes.
+
+    Returns (kmers, offsets): the k-mers of sequence i are
+    kmers[offsets[i]:offsets[i + 1]].
+    """
+    # One buffer for all sequences, separated by an invalid residue so no
+    # k-mer spans two proteins.
+    separator = np.zeros(1, dtype=np.uint8)
+    buffer = np.concatenate([part for seq in seqs for part in (seq, separator)] or [separator])
+    codes = RESIDUE_CODES[buffer]
+    lengths = np.fromiter((len(s) + 1 for s in seqs), dtype=np.int64, count=len(seqs))
+    owner = np.repeat(np.arange(len(seqs), dtype=np.uint64), lengths)
+
+    if len(codes) < k:
+        return np.empty(0, dtype=np.uint64), np.zeros(len(seqs) + 1, dtype=np.int64)
+
+    windows = np.lib.stride_tricks.sliding_window_view(codes, k)
+    valid = windows.min(axis=1) > 0
+    shifts = np.arange(k - 1, -1, -1, dtype=np.uint64) * np.uint64(BITS_PER_RESIDUE)
+    kmers = np.bitwise_or.reduce(windows[valid] << shifts, axis=1)
+    owners = owner[: len(windows)][valid]
+
+    # Deduplicate (protein, k-mer) pairs in one sort
+    keyed = np.unique((owners << np.uint64(32)) | kmers)
+    owners = keyed >> np.uint64(32)
+    kmers = keyed & np.uint64(0xFFFFFFFF)
+    offsets = np.searchsorted(owners, np.arange(len(seqs) + 1, dtype=np.uint64))
+    return kmers, offsets
+
+
+# --------------------
+# MinHash
+# --------------------
+def minhash_signatures(kmers, offsets, num_perm, seed):
+    """MinHash signature matrix of shape (n_sequences, num_perm).
+
+    Sequences without k-mers keep an all-max signature and never collide.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(HASH_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+    b = rng.integers(0, int(HASH_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+
+    n = len(offsets) - 1
+    signatures = np.full((n, num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    max_kmers = max(1, CHUNK_ELEMENTS // num_perm)
+
+    start = 0
+    while start < n:
+        # Grow the chunk until it holds max_kmers k-mers (at least one sequence)
+        stop = int(np.searchsorted(offsets, offsets[start] + max_kmers, side="right")) - 1
+        stop = min(max(stop, start + 1), n)
+        lo, hi = offsets[start], offsets[stop]
+        if hi > lo:
+            hashed = (a * kmers[lo:hi][None, :] + b) % HASH_PRIME
+            seg_starts = offsets[start:stop] - lo
+            non_empty = offsets[start + 1 : stop + 1] > offsets[start:stop]
+            reduced = np.minimum.reduceat(hashed, seg_starts[non_empty], axis=1)
+            signatures[np.arange(start, stop)[non_empty]] = reduced.T
+        start = stop
+
+    return signatures
+
+
+def lsh_candidates(signatures, bands, max_bucket):
+    """Candidate pairs (i < j) sharing at least one LSH band bucket."""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    empty = (signatures == np.iinfo(np.uint64).max).all(axis=1)
+    pairs = []
+
+    for band in range(bands):
+        block = np.ascontiguousarray(signatures[:, band * rows : (band + 1) * rows])
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+        _, bucket = np.unique(keys, return_inverse=True)
+        bucket = bucket.ravel()
+        bucket[empty] = -1
+
+        order = np.argsort(bucket, kind="stable")
+        sorted_bucket = bucket[order]
+        bounds = np.flatnonzero(np.diff(sorted_bucket)) + 1
+        starts = np.concatenate(([0], bounds))
+        ends = np.concatenate((bounds, [n]))
+        sizes = ends - starts
+        shared = (sizes > 1) & (sizes <= max_bucket) & (sorted_bucket[starts] >= 0)
+        for s, e in zip(starts[shared], ends[shared]):
+            members = np.sort(order[s:e])
+            i, j = np.triu_indices(len(members), 1)
+            pairs.append(members[i].astype(np.int64) * n + members[j])
+
+    if not pairs:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    flat = np.unique(np.concatenate(pairs))
+    return flat // n, flat % n
+
+
+def signature_jaccard(signatures, left, right, chunk=1 << 16):
+    """Vectorized MinHash estimate of the Jaccard similarity of each pair."""
+    estimates = np.empty(len(left), dtype=np.float64)
+    for start in range(0, len(left), chunk):
+        stop = start + chunk
+        estimates[start:stop] = (
+            signatures[left[start:stop]] == signatures[right[start:stop]]
+        ).mean(axis=1)
+    return estimates
+
+
+def exact_jaccard(kmers, offsets, left, right):
+    """Exact Jaccard similarity of the k-mer sets of each pair."""
+    scores = np.empty(len(left), dtype=np.float64)
+    for idx, (i, j) in enumerate(zip(left, right)):
+        a = kmers[offsets[i] : offsets[i + 1]]
+        b = kmers[offsets[j] : offsets[j + 1]]
+        shared = len(np.intersect1d(a, b, assume_unique=True))
+        union = len(a) + len(b) - shared
+        scores[idx] = shared / union if union else 0.0
+    return scores
+
+
+# --------------------
+# Clustering
+# --------------------
+def connected_components(n, left, right):
+    """Union-find over the given edges; returns a component label per node."""
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j in zip(left.tolist(), right.tolist()):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return [find(x) for x in range(n)]
+
+
+def cluster_rows(cluster_type, names, labels, species=None):
+    """Rows for protein_clusters, keeping only multi-member components.
+
+    With species given, components confined to a single species are
+    dropped as well.
+    """
+    members = {}
+    for idx, label in enumerate(labels):
+        members.setdefault(label, []).append(idx)
+
+    rows = []
+    cluster_id = 0
+    for label in sorted(members, key=lambda lab: names[members[lab][0]]):
+        group = members[label]
+        if len(group) < 2:
+            continue
+        if species is not None and len({species[i] for i in group}) < 2:
+            continue
+        cluster_id += 1
+        rows.extend((cluster_type, names[i], cluster_id) for i in group)
+    return rows
+
+
+def write_results(conn, names, left, right, scores, redundant_rows, ortholog_rows, max_related):
+    similarity = {}
+    for i, j, score in zip(left.tolist(), right.tolist(), scores.tolist()):
+        similarity.setdefault(i, []).append((score, j))
+        similarity.setdefault(j, []).append((score, i))
+
+    similarity_rows = []
+    for i, related in similarity.items():
+        related.sort(key=lambda item: (-item[0], names[item[1]]))
+        similarity_rows.extend(
+            (names[i], names[j], round(score, 4)) for score, j in related[:max_related]
+        )
+
+    with conn:
+        conn.executescript(SCHEMA)
+        conn.execute("DELETE FROM protein_similarity")
+        conn.execute("DELETE FROM protein_clusters")
+        conn.executemany("INSERT INTO protein_similarity VALUES (?, ?, ?)", similarity_rows)
+        conn.executemany("INSERT INTO protein_clusters VALUES (?, ?, ?)", redundant_rows + ortholog_rows)
+    return len(similarity_rows)
+
+
+# --------------------
+# Entry point
+# --------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--k", type=int, default=4, help=f"k-mer length (1-{MAX_K})")
+    parser.add_argument("--num-perm", type=int, default=128, help="MinHash permutations")
+    parser.add_argument("--bands", type=int, default=64, help="LSH bands (must divide --num-perm)")
+    parser.add_argument("--max-bucket", type=int, default=500, help="skip LSH buckets larger than this")
+    parser.add_argument("--related-threshold", type=float, default=0.3, help="minimum Jaccard for related proteins and ortholog groups")
+    parser.add_argument("--redundant-threshold", type=float, default=0.9, help="minimum Jaccard for near-identical entries")
+    parser.add_argument("--max-related", type=int, default=20, help="related proteins stored per entry")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not 1 <= args.k <= MAX_K:
+        parser.error(f"--k must be between 1 and {MAX_K}")
+    if args.num_perm % args.bands:
+        parser.error("--bands must divide --num-perm")
+
+    started = time.perf_counter()
+    conn = connect(args.db)
+    try:
+        names, species, seqs = load_proteins(conn)
+        kmers, offsets = kmer_sets(seqs, args.k)
+        signatures = minhash_signatures(kmers, offsets, args.num_perm, args.seed)
+        left, right = lsh_candidates(signatures, args.bands, args.max_bucket)
+        n_candidates = len(left)
+
+        # Cheap vectorized filter on the sketches (with slack for estimation
+        # error), then the exact score on the survivors.
+        estimates = signature_jaccard(signatures, left, right)
+        keep = estimates >= args.related_threshold - 0.1
+        left, right = left[keep], right[keep]
+        scores = exact_jaccard(kmers, offsets, left, right)
+        keep = scores >= args.related_threshold
+        left, right, scores = left[keep], right[keep], scores[keep]
+
+        strong = scores >= args.redundant_threshold
+        redundant_rows = cluster_rows(
+            "redundant", names, connected_components(len(names), left[strong], right[strong])
+        )
+        ortholog_rows = cluster_rows(
+            "ortholog", names, connected_components(len(names), left, right), species
+        )
+        n_similarity = write_results(
+            conn, names, left, right, scores, redundant_rows, ortholog_rows, args.max_related
+        )
+    finally:
+        conn.close()
+
+    print(
+        f"{len(names)} proteins, {n_candidates} candidate pairs, {len(scores)} verified pairs, "
+        f"{n_similarity} similarity rows, "
+        f"{len({r[2] for r in redundant_rows})} redundant and "
+        f"{len({r[2] for r in ortholog_rows})} ortholog clusters "
+        f"in {time.perf_counter() - started:.1f}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""Vectorized codon-usage and CDS analytics.
+
+CDS sequences from the `sequences` table are encoded in bulk into integer
+codon arrays with NumPy. For each distinct CDS the job computes codon
+counts, GC and GC3 content, internal stop codons and the digest of its
+translation; results are cached in `cds_stats` by sequence hash, so only
+new or edited CDS are analysed on later runs. `cds_entries` links every
+protein to its CDS and records whether the CDS translates to the stored
+protein sequence.
+
+Each run also stores codon usage and GC/GC3 aggregated per taxonomy group
+in `cds_group_stats`, which the Statistics page reads as is;
+`--aggregate LEVEL` prints the same aggregation as TSV.
+
+Usage:
+    python scripts/codon_usage.py [--batch-size 50000] [--aggregate species]
+"""
+
+import argparse
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from common import DB_PATH, connect, iter_sequence_arrays
+
+# Standard genetic code, codons ordered TTT, TTC, TTA, TTG, TCT, ... GGG
+BASES = "TCAG"
+GENETIC_CODE = "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG"
+CODONS = [a + b + c for a in BASES for b in BASES for c in BASES]
+
+AMBIGUOUS = 4
+BASE_CODES = np.full(256, AMBIGUOUS, dtype=np.uint8)
+for _i, _base in enumerate(BASES):
+    BASE_CODES[ord(_base)] = _i
+BASE_CODES[ord("U")] = BASE_CODES[ord("T")]
+
+# Codon index -> amino acid byte; index 64 stands for an ambiguous codon
+TRANSLATION = np.frombuffer((GENETIC_CODE + "X").encode("ascii"), dtype=np.uint8)
+STOP = ord("*")
+IS_GC = np.zeros(AMBIGUOUS + 1, dtype=bool)
+IS_GC[[BASES.index("C"), BASES.index("G")]] = True
+
+# GC3 is measured over fully unambiguous codons only, i.e. straight from
+# the codon counts, so per-CDS values and group aggregates agree.
+GC3_CODONS = np.array([c[2] in "GC" for c in CODONS])
+
+TAXONOMY_LEVELS = ["species", "genus", "family", "order", "class", "subphylum", "phylum"]
+
+# Levels stored in cds_group_stats; "all" is one group covering every CDS
+AGGREGATE_LEVELS = ["all"] + TAXONOMY_LEVELS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cds_stats (
+    cds_sha1 TEXT PRIMARY KEY,
+    length INTEGER NOT NULL,
+    codons INTEGER NOT NULL,
+    ambiguous_codons INTEGER NOT NULL,
+    internal_stops INTEGER NOT NULL,
+    gc_bases INTEGER NOT NULL,
+    acgt_bases INTEGER NOT NULL,
+    gc REAL,
+    gc3 REAL,
+    translation_sha1 TEXT NOT NULL,
+    codon_counts BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cds_entries (
+    protein_name TEXT PRIMARY KEY,
+    cds_sha1 TEXT NOT NULL,
+    translation_status TEXT NOT NULL,
+    FOREIGN KEY (protein_name) REFERENCES proteins(name),
+    FOREIGN KEY (cds_sha1) REFERENCES cds_stats(cds_sha1)
+);
+CREATE TABLE IF NOT EXISTS cds_group_stats (
+    level TEXT NOT NULL,
+    group_name TEXT NOT NULL,
+    entries INTEGER NOT NULL,
+    codons INTEGER NOT NULL,
+    gc REAL,
+    gc3 REAL,
+    translation_match INTEGER NOT NULL,
+    codon_counts BLOB NOT NULL,
+    PRIMARY KEY (level, group_name)
+);
+"""
+
+
+def sha1(seq):
+    """Hex SHA-1 of a sequence given as a uint8 array (or bytes)."""
+    return hashlib.sha1(seq).hexdigest()
+
+
+def strip_stops(seq):
+    """Drop trailing stop symbols from a uint8 sequence array."""
+    end = len(seq)
+    while end and seq[end - 1] == STOP:
+        end -= 1
+    return seq[:end]
+
+
+def segment_sums(values, starts, ends):
+    """Sum values[starts[i]:ends[i]] for every i, empty segments included."""
+    cumulative = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    return cumulative[ends] - cumulative[starts]
+
+
+# --------------------
+# Bulk analysis
+# --------------------
+def analyse_batch(seqs):
+    """Analyse a batch of CDS (uint8 arrays); returns one row per sequence."""
+    lengths = np.fromiter((len(s) for s in seqs), dtype=np.int64, count=len(seqs))
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    ends = starts + lengths
+    buffer = np.concatenate(seqs) if seqs else np.empty(0, dtype=np.uint8)
+    bases = BASE_CODES[buffer]
+
+    # Whole-sequence GC over unambiguous bases
+    gc_count = segment_sums(IS_GC[bases], starts, ends)
+    acgt_count = segment_sums(bases < AMBIGUOUS, starts, ends)
+
+    # In-frame codon positions for every sequence, in one array
+    n_codons = lengths // 3
+    entry = np.repeat(np.arange(len(seqs)), n_codons)
+    first_codon = np.concatenate(([0], np.cumsum(n_codons)[:-1]))
+    frame_index = np.arange(len(entry)) - first_codon[entry]
+    pos = starts[entry] + 3 * frame_index
+
+    b1, b2, b3 = bases[pos], bases[pos + 1], bases[pos + 2]
+    ambiguous = (b1 == AMBIGUOUS) | (b2 == AMBIGUOUS) | (b3 == AMBIGUOUS)
+    codon = 16 * b1.astype(np.int64) + 4 * b2 + b3
+    codon[ambiguous] = 64
+
+    counts = np.bincount(
+        entry[~ambiguous] * 64 + codon[~ambiguous], minlength=len(seqs) * 64
+    ).reshape(len(seqs), 64).astype("<u4")
+
+    gc3_count = counts[:, GC3_CODONS].sum(axis=1)
+    codon_count = counts.sum(axis=1)
+
+    amino_acids = TRANSLATION[codon]
+    is_internal_stop = (amino_acids == STOP) & (frame_index < n_codons[entry] - 1)
+    internal_stops = np.bincount(entry, weights=is_internal_stop, minlength=len(seqs))
+    ambiguous_codons = np.bincount(entry, weights=ambiguous, minlength=len(seqs))
+
+    rows = []
+    for i, seq in enumerate(seqs):
+        protein = amino_acids[first_codon[i] : first_codon[i] + n_codons[i]]
+        rows.append((
+            sha1(seq),
+            int(lengths[i]),
+            int(n_codons[i]),
+            int(ambiguous_codons[i]),
+            int(internal_stops[i]),
+            int(gc_count[i]),
+            int(acgt_count[i]),
+            float(gc_count[i] / acgt_count[i]) if acgt_count[i] else None,
+            float(gc3_count[i] / codon_count[i]) if codon_count[i] else None,
+            sha1(strip_stops(protein)),
+            counts[i].tobytes(),
+        ))
+    return rows
+
+
+def translation_status(translation_sha1, protein_seq):
+    if protein_seq is None:
+        return "no_protein"
+    return "match" if translation_sha1 == sha1(strip_stops(protein_seq)) else "mismatch"
+
+
+def drop_tables(conn):
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS cds_group_stats")
+        conn.execute("DROP TABLE IF EXISTS cds_entries")
+        conn.execute("DROP TABLE IF EXISTS cds_stats")
+
+
+def update(conn, batch_size):
+    """Analyse uncached CDS, rebuild cds_entries and cds_group_stats; returns counts."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(cds_stats)")}
+    if columns and "gc_bases" not in columns:
+        # Cache from before base counts were stored: analyse everything again
+        drop_tables(conn)
+    conn.executescript(SCHEMA)
+    cached = {row[0] for row in conn.execute("SELECT cds_sha1 FROM cds_stats")}
+
+    proteins = {}
+    for name, _, seq in iter_sequence_arrays(conn, "protein"):
+        proteins.setdefault(name, seq)
+
+    entries = {}
+    pending = {}
+    analysed = 0
+    for name, _, seq in iter_sequence_arrays(conn, "cds"):
+        if name in entries or not len(seq):
+            continue
+        digest = sha1(seq)
+        entries[name] = digest
+        if digest not in cached and digest not in pending:
+            pending[digest] = seq
+            if len(pending) >= batch_size:
+                analysed += flush(conn, pending)
+                cached.update(pending)
+                pending = {}
+    analysed += flush(conn, pending)
+
+    translation_by_cds = dict(conn.execute("SELECT cds_sha1, translation_sha1 FROM cds_stats"))
+    with conn:
+        conn.execute("DELETE FROM cds_entries")
+        conn.executemany(
+            "INSERT INTO cds_entries VALUES (?, ?, ?)",
+            (
+                (name, digest, translation_status(translation_by_cds[digest], proteins.get(name)))
+                for name, digest in entries.items()
+            ),
+        )
+        conn.execute(
+            "DELETE FROM cds_stats WHERE cds_sha1 NOT IN (SELECT cds_sha1 FROM cds_entries)"
+        )
+    store_aggregates(conn)
+    return len(entries), analysed
+
+
+def flush(conn, pending):
+    if not pending:
+        return 0
+    rows = analyse_batch(list(pending.values()))
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO cds_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+    return len(rows)
+
+
+# --------------------
+# Aggregation
+# --------------------
+def aggregate(conn, level):
+    """Per-group codon usage and GC/GC3, summed from base and codon counts.
+
+    Returns (groups, totals, rows) where rows hold (group, entries, codons,
+    gc, gc3, matching translations).
+    """
+    column = "'All'" if level == "all" else f'p."{level}"'
+    query = f"""
+        SELECT {column}, s.codon_counts, s.gc_bases, s.acgt_bases, e.translation_status
+        FROM cds_entries e
+        JOIN cds_stats s ON s.cds_sha1 = e.cds_sha1
+        JOIN proteins p ON p.name = e.protein_name
+        WHERE {column} IS NOT NULL
+        ORDER BY {column}
+    """
+    records = conn.execute(query).fetchall()
+    if not records:
+        return [], np.zeros((0, 64)), []
+
+    groups, inverse = np.unique([r[0] for r in records], return_inverse=True)
+    counts = np.frombuffer(b"".join(r[1] for r in records), dtype="<u4").reshape(-1, 64)
+    totals = np.zeros((len(groups), 64), dtype=np.int64)
+    np.add.at(totals, inverse, counts)
+
+    gc_bases = np.bincount(inverse, weights=[r[2] for r in records], minlength=len(groups))
+    acgt_bases = np.bincount(inverse, weights=[r[3] for r in records], minlength=len(groups))
+    matches = np.bincount(inverse, weights=[r[4] == "match" for r in records], minlength=len(groups))
+    entries = np.bincount(inverse, minlength=len(groups))
+
+    third_gc = totals[:, GC3_CODONS].sum(axis=1)
+    codons = totals.sum(axis=1)
+    rows = [
+        (
+            groups[g],
+            int(entries[g]),
+            int(codons[g]),
+            gc_bases[g] / acgt_bases[g] if acgt_bases[g] else float("nan"),
+            third_gc[g] / codons[g] if codons[g] else float("nan"),
+            int(matches[g]),
+        )
+        for g in range(len(groups))
+    ]
+    return groups, totals, rows
+
+
+def store_aggregates(conn):
+    """Rebuild cds_group_stats for every level in AGGREGATE_LEVELS."""
+    rows = []
+    for level in AGGREGATE_LEVELS:
+        _, totals, level_rows = aggregate(conn, level)
+        for (group, entries, codons, gc, gc3, matches), counts in zip(level_rows, totals):
+            rows.append((
+                level,
+                str(group),
+                entries,
+                codons,
+                None if np.isnan(gc) else float(gc),
+                None if np.isnan(gc3) else float(gc3),
+                matches,
+                counts.astype("<u8").tobytes(),
+            ))
+    with conn:
+        conn.execute("DELETE FROM cds_group_stats")
+        conn.executemany("INSERT INTO cds_group_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def print_aggregate(conn, level, out):
+    _, totals, rows = aggregate(conn, level)
+    out.write("\t".join([level, "entries", "codons", "gc", "gc3", "translation_match"] + CODONS) + "\n")
+    for row, counts in zip(rows, totals):
+        freqs = counts / counts.sum() if counts.sum() else counts
+        out.write(
+            "\t".join(
+                [str(row[0]), str(row[1]), str(row[2]), f"{row[3]:.4f}", f"{row[4]:.4f}", str(row[5])]
+                + [f"{f:.5f}" for f in freqs]
+            )
+            + "\n"
+        )
+
+
+# --------------------
+# Entry point
+# --------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--batch-size", type=int, default=50000, help="CDS analysed per NumPy batch")
+    parser.add_argument("--rebuild", action="store_true", help="drop the cache and analyse every CDS again")
+    parser.add_argument("--aggregate", choices=TAXONOMY_LEVELS, help="print codon usage per group as TSV")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    conn = connect(args.db)
+    try:
+        if args.rebuild:
+            drop_tables(conn)
+        n_entries, analysed = update(conn, args.batch_size)
+        if args.aggregate:
+            print_aggregate(conn, args.aggregate, sys.stdout)
+    finally:
+        conn.close()
+
+    print(
+        f"{n_entries} CDS entries, {analysed} newly analysed "
+        f"in {time.perf_counter() - started:.1f}s",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Shared paths and helpers for the Cuticulome.db command-line tools."""
+
+import sqlite3
+from pathlib import Path
+
+# --------------------
+# Paths
+# --------------------
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DB_PATH = REPO_ROOT / "cuticulome.db"
+FASTA_ROOT = REPO_ROOT / "fasta_files"
+CLEAN_CSV = REPO_ROOT / "data" / "clean.csv"
+
+# File name suffix for each seq_type used in the `sequences` table
+FASTA_SUFFIXES = {
+    "protein": "_prot.fasta",
+    "cds": "_cds.fasta",
+}
+
+# Accepted sequence alphabets: IUPAC nucleotide codes for CDS; amino acids,
+# ambiguity codes, stop and gap for proteins. The protein order also fixes
+# the 5-bit codes used by seqpack.py, so only ever append to it.
+CDS_ALPHABET = "ACGTNRYSWKMBDHV"
+PROTEIN_ALPHABET = "ACDEFGHIKLMNPQRSTVWYBZXUO*-"
+
+# Columns of the `proteins` table, in table order
+PROTEIN_COLUMNS = [
+    "name",
+    "species",
+    "phylum",
+    "subphylum",
+    "class",
+    "order",
+    "family",
+    "genus",
+    "protein_family",
+    "function",
+    "reference",
+    "doi",
+]
+
+# Column headers used in data/clean.csv and in exported metadata.csv
+CSV_COLUMNS = {
+    "Cuticular Protein Name": "name",
+    "Species": "species",
+    "Phylum": "phylum",
+    "Subphylum": "subphylum",
+    "Class": "class",
+    "Order": "order",
+    "Family": "family",
+    "Genus": "genus",
+    "Protein Family": "protein_family",
+    "Function": "function",
+    "Reference": "reference",
+    "DOI": "doi",
+}
+
+
+def connect(db_path=DB_PATH):
+    """Open the database; fail instead of silently creating an empty file."""
+    db_path = Path(db_path)
+    if not db_path.is_file():
+        raise FileNotFoundError(f"Database not found: {db_path}")
+    return sqlite3.connect(db_path)
+
+
+def normalize_sequence(seq):
+    """Uppercase a sequence and drop all whitespace."""
+    return "".join(seq.split()).upper()
+
+
+def read_fasta(path):
+    """Return a list of (header, sequence) records from a FASTA file."""
+    records = []
+    header = None
+    chunks = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(">"):
+                if header is not None:
+                    records.append((header, normalize_sequence("".join(chunks))))
+                header = line[1:].strip()
+                chunks = []
+            else:
+                chunks.append(line)
+    if header is not None:
+        records.append((header, normalize_sequence("".join(chunks))))
+    return records
+
+
+def has_packed_columns(conn):
+    """Whether the sequences table has the packed storage columns (seqpack.py)."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(sequences)")}
+    return "packed" in columns
+
+
+def iter_sequence_arrays(conn, seq_type=None):
+    """Yield (protein_name, seq_type, array) rows of the `sequences` table.
+
+    Sequences come back as uint8 arrays of ASCII codes, decoded straight
+    from packed storage (see seqpack.py) without building Python strings.
+    """
+    from seqpack import decode_array
+
+    if has_packed_columns(conn):
+        query = "SELECT protein_name, seq_type, encoding, length, packed, sequence FROM sequences"
+    else:
+        query = "SELECT protein_name, seq_type, NULL, NULL, NULL, sequence FROM sequences"
+    params = ()
+    if seq_type is not None:
+        query += " WHERE seq_type = ?"
+        params = (seq_type,)
+    for protein_name, row_type, encoding, length, packed, sequence in conn.execute(
+        query + " ORDER BY id", params
+    ):
+        yield protein_name, row_type, decode_array(encoding, length, packed, sequence)
+
+
+def iter_sequences(conn, seq_type=None):
+    """Yield (protein_name, seq_type, sequence) rows of the `sequences` table."""
+    for protein_name, row_type, array in iter_sequence_arrays(conn, seq_type):
+        yield protein_name, row_type, array.tobytes().decode("ascii", "replace")
@@ -0,0 +1,413 @@
+"""Multi-user load test for the Streamlit pages.
+
+Builds a synthetic database of configurable size in a temporary directory,
+then drives `1_Database.py` and `pages/Statistics.py` headlessly with
+Streamlit's AppTest. Each simulated session follows a scripted sequence of
+filter, search, related-protein and codon-usage interactions; sessions run
+in parallel worker processes. Worker processes share `st.cache_data`
+between their sessions, as the threads of a real Streamlit server do.
+
+The report gives p50/p95/p99 rerun latency, throughput, the resident memory
+each session adds to its worker, and total resident memory. Nothing touches
+the network.
+
+Usage:
+    python scripts/loadtest.py [--proteins 5000] [--sessions 50] [--concurrency 8]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import cluster
+import codon_usage
+from common import FASTA_SUFFIXES, PROTEIN_COLUMNS, REPO_ROOT
+
+APP_PAGES = {
+    "database": REPO_ROOT / "1_Database.py",
+    "statistics": REPO_ROOT / "pages" / "Statistics.py",
+}
+
+AMINO_ACIDS = "ACDEFGHIKLMNPQRSTVWY"
+PROTEIN_FAMILIES = ["CPR RR-1", "CPR RR-2", "CPAP1", "CPAP3", "CPLCA", "CPLCG", "CPF", "CPCFC", "Tweedle", None]
+SEARCH_TERMS = ["CPR", "RR-1", "cuticle", "et al.", "doi.org/10", "CPAP3", "Tweedle", "zzz-no-match"]
+
+# Shape of the synthetic taxonomy tree: children per node at each level
+TAXONOMY_FANOUT = [("subphylum", 3), ("class", 3), ("order", 4), ("family", 3), ("genus", 3), ("species", 2)]
+
+# Share of synthetic proteins derived from an earlier one by point
+# mutations, so clustering finds related proteins
+VARIANT_SHARE = 0.3
+VARIANT_MUTATION_RATE = 0.05
+
+
+# --------------------
+# Synthetic site
+# --------------------
+def random_protein(rng, proteins):
+    if proteins and rng.random() < VARIANT_SHARE:
+        residues = list(rng.choice(proteins))
+        for pos in rng.sample(range(1, len(residues)), int(len(residues) * VARIANT_MUTATION_RATE)):
+            residues[pos] = rng.choice(AMINO_ACIDS)
+        return "".join(residues)
+    return "M" + "".join(rng.choices(AMINO_ACIDS, k=rng.randint(80, 400)))
+
+
+def build_site(root, n_proteins, seed):
+    """Create cuticulome.db, fasta_files/ and data/ under root.
+
+    The database also gets the tables computed by cluster.py and
+    codon_usage.py, so the pages show their related-protein and codon
+    usage sections.
+    """
+    rng = random.Random(seed)
+
+    lineages = [{"phylum": "Arthropoda"}]
+    for level, fanout in TAXONOMY_FANOUT:
+        lineages = [
+            dict(lineage, **{level: f"{level.capitalize()}{n * fanout + i:03d}"})
+            for n, lineage in enumerate(lineages)
+            for i in range(fanout)
+        ]
+    for lineage in lineages:
+        lineage["species"] = f"{lineage['genus']} {lineage['species'].lower()}"
+
+    conn = sqlite3.connect(root / "cuticulome.db")
+    conn.executescript(
+        """
+        CREATE TABLE proteins (
+            name TEXT PRIMARY KEY,
+            species TEXT,
+            phylum TEXT,
+            subphylum TEXT,
+            class TEXT,
+            "order" TEXT,
+            family TEXT,
+            genus TEXT,
+            protein_family TEXT,
+            function TEXT,
+            reference TEXT,
+            doi TEXT
+        );
+        CREATE TABLE sequences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            protein_name TEXT,
+            seq_type TEXT,
+            sequence TEXT,
+            FOREIGN KEY (protein_name) REFERENCES proteins(name)
+        );
+        """
+    )
+
+    fasta_root = root / "fasta_files"
+    proteins = []
+    sequences = []
+    protein_seqs = []
+    for i in range(n_proteins):
+        lineage = rng.choice(lineages)
+        family = rng.choice(PROTEIN_FAMILIES)
+        name = f"Syn_{(family or 'CP').replace(' ', '')}-{i}"
+        protein = random_protein(rng, protein_seqs)
+        protein_seqs.append(protein)
+        cds = "ATG" + "".join(rng.choices("ACGT", k=3 * (len(protein) - 1))) + "TAA"
+        proteins.append((
+            name,
+            lineage["species"],
+            lineage["phylum"],
+            lineage["subphylum"],
+            lineage["class"],
+            lineage["order"],
+            lineage["family"],
+            lineage["genus"],
+            family,
+            rng.choice([None, "cuticle hardening", "cuticle flexibility"]),
+            f"Author{rng.randint(1, 200)} et al.",
+            f"doi.org/10.0000/synthetic.{i}",
+        ))
+        sequences.append((name, "cds", cds))
+        sequences.append((name, "protein", protein))
+
+        protein_dir = fasta_root / name
+        protein_dir.mkdir(parents=True)
+        for seq_type, seq in (("cds", cds), ("protein", protein)):
+            with open(protein_dir / f"{name}{FASTA_SUFFIXES[seq_type]}", "w", encoding="utf-8") as f:
+                f.write(f">{name} synthetic\n")
+                for start in range(0, len(seq), 70):
+                    f.write(seq[start:start + 70] + "\n")
+
+    placeholders = ", ".join("?" * len(PROTEIN_COLUMNS))
+    with conn:
+        conn.executemany(f"INSERT INTO proteins VALUES ({placeholders})", proteins)
+        conn.executemany(
+            "INSERT INTO sequences (protein_name, seq_type, sequence) VALUES (?, ?, ?)", sequences
+        )
+    conn.close()
+
+    cluster.main(["--db", str(root / "cuticulome.db"), "--seed", str(seed)])
+    codon_usage.main(["--db", str(root / "cuticulome.db")])
+
+    (root / "data").mkdir()
+    with open(root / "data" / "publications_by_year.csv", "w", encoding="utf-8") as f:
+        f.write("Year,Count\n")
+        for year in range(2000, 2026):
+            f.write(f"{year},{rng.randint(0, 40)}\n")
+
+
+# --------------------
+# Sessions (run in worker processes)
+# --------------------
+def current_rss_mb():
+    """Resident set size of this process in MiB."""
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Peak RSS (KiB on Linux, bytes on macOS) where /proc is unavailable
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def init_worker(site_root):
+    # The pages open cuticulome.db, fasta_files/ and data/ relative to cwd
+    os.chdir(site_root)
+    # and import footer.py from the repo root, which `streamlit run` puts
+    # on sys.path
+    sys.path.insert(0, str(REPO_ROOT))
+    os.environ["STREAMLIT_BROWSER_GATHER_USAGE_STATS"] = "false"
+
+
+def find_widget(widgets, label):
+    """The widget with this label; a missing widget fails the step."""
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise LookupError(f"no widget labelled {label!r}")
+
+
+def database_steps(rng):
+    """Scripted interactions for the Database page, as (name, action) pairs.
+
+    Every rerun rebuilds the export ZIP for the current selection, so each
+    step also measures export cost.
+    """
+
+    def search(at):
+        at.text_input[0].input(rng.choice(SEARCH_TERMS))
+
+    def clear_search(at):
+        at.text_input[0].input("")
+
+    def drill_down(label):
+        def action(at):
+            box = find_widget(at.selectbox, label)
+            if len(box.options) > 1:
+                box.set_value(rng.choice(box.options[1:]))
+        return action
+
+    def reset_filters(at):
+        find_widget(at.selectbox, "Subphylum").set_value("All")
+
+    def related(at):
+        box = find_widget(at.selectbox, "Show proteins similar to")
+        box.set_value(rng.choice(box.options))
+
+    steps = [("search", search), ("clear_search", clear_search)]
+    steps += [(f"filter_{label.lower()}", drill_down(label)) for label in ["Subphylum", "Class", "Order", "Family"]]
+    # Related proteins are only listed while the filtered table is non-empty,
+    # so pick one before searching (a search term may match nothing)
+    steps += [("related", related), ("search_in_filter", search), ("reset_filters", reset_filters)]
+    return steps
+
+
+def statistics_steps(rng):
+    def group_by(at):
+        box = find_widget(at.selectbox, "Group by")
+        box.set_value(rng.choice(box.options))
+
+    return [("group_by", group_by), ("group_by_again", group_by)]
+
+
+SESSION_SCRIPTS = {
+    "database": database_steps,
+    "statistics": statistics_steps,
+}
+
+
+def run_session(session_id, page, seed, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    latencies = []
+    errors = []
+
+    # Running a page replaces sys.modules["__main__"]; the pool needs the
+    # original back to unpickle the next task sent to this worker.
+    main_module = sys.modules["__main__"]
+    rss_before = current_rss_mb()
+    at = AppTest.from_file(str(APP_PAGES[page]), default_timeout=timeout)
+    steps = [("load", None)] + SESSION_SCRIPTS[page](rng)
+    started = time.perf_counter()
+    try:
+        for name, action in steps:
+            try:
+                if action is not None:
+                    action(at)
+                t0 = time.perf_counter()
+                at.run()
+                latencies.append((name, time.perf_counter() - t0))
+                if at.exception:
+                    errors.append(f"{name}: {at.exception[0].message}")
+            except Exception as e:  # keep the session going, record the failure
+                errors.append(f"{name}: {type(e).__name__}: {e}")
+    finally:
+        sys.modules["__main__"] = main_module
+
+    rss_after = current_rss_mb()
+    return {
+        "session": session_id,
+        "page": page,
+        "pid": os.getpid(),
+        "duration_s": time.perf_counter() - started,
+        "latencies": latencies,
+        "rss_mb": rss_after,
+        "rss_delta_mb": rss_after - rss_before,
+        "errors": errors,
+    }
+
+
+# --------------------
+# Report
+# --------------------
+def percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": p50, "p95": p95, "p99": p99, "max": max(values)}
+
+
+def build_report(args, results, wall_time, setup_time):
+    all_latencies = [lat for r in results for _, lat in r["latencies"]]
+    by_step = {}
+    for r in results:
+        for name, lat in r["latencies"]:
+            by_step.setdefault(f"{r['page']}:{name}", []).append(lat)
+
+    # rss_mb is the worker's RSS after a session, so it includes earlier
+    # sessions in that worker; per session we report the change across the
+    # session. A worker's largest reading is its peak; total is the sum
+    # over worker processes.
+    rss_by_pid = {}
+    for r in results:
+        rss_by_pid[r["pid"]] = max(rss_by_pid.get(r["pid"], 0), r["rss_mb"])
+
+    return {
+        "config": {
+            "proteins": args.proteins,
+            "sessions": args.sessions,
+            "concurrency": args.concurrency,
+            "statistics_share": args.statistics_share,
+            "seed": args.seed,
+        },
+        "setup_s": setup_time,
+        "wall_s": wall_time,
+        "reruns": len(all_latencies),
+        "throughput_reruns_per_s": len(all_latencies) / wall_time if wall_time else None,
+        "latency_s": percentiles(all_latencies),
+        "latency_by_step_s": {step: percentiles(lats) for step, lats in sorted(by_step.items())},
+        "rss_mb": {
+            "session_delta": percentiles([r["rss_delta_mb"] for r in results]),
+            "workers": len(rss_by_pid),
+            "total": sum(rss_by_pid.values()) + current_rss_mb(),
+        },
+        "errors": [f"session {r['session']} ({r['page']}) {e}" for r in results for e in r["errors"]],
+        "sessions": [
+            {
+                "session": r["session"],
+                "page": r["page"],
+                "reruns": len(r["latencies"]),
+                "duration_s": r["duration_s"],
+                "mean_latency_s": float(np.mean([lat for _, lat in r["latencies"]])) if r["latencies"] else None,
+                "rss_delta_mb": r["rss_delta_mb"],
+            }
+            for r in results
+        ],
+    }
+
+
+# --------------------
+# Entry point
+# --------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--proteins", type=int, default=5000, help="size of the synthetic database")
+    parser.add_argument("--sessions", type=int, default=50, help="simulated user sessions")
+    parser.add_argument("--concurrency", type=int, default=os.cpu_count() or 1, help="worker processes running sessions in parallel")
+    parser.add_argument("--statistics-share", type=float, default=0.2, help="fraction of sessions on the Statistics page")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-site", type=Path, help="build the synthetic site here and keep it")
+    parser.add_argument("--output", type=Path, help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.keep_site:
+        args.keep_site.mkdir(parents=True, exist_ok=False)
+        site_root = args.keep_site
+    else:
+        site_root = Path(tempfile.mkdtemp(prefix="cuticulome_loadtest_"))
+
+    try:
+        t0 = time.perf_counter()
+        build_site(site_root, args.proteins, args.seed)
+        setup_time = time.perf_counter() - t0
+
+        rng = random.Random(args.seed)
+        plan = [
+            (i, "statistics" if rng.random() < args.statistics_share else "database", rng.randrange(2**32))
+            for i in range(args.sessions)
+        ]
+
+        t0 = time.perf_counter()
+        with ProcessPoolExecutor(
+            max_workers=args.concurrency, initializer=init_worker, initargs=(str(site_root),)
+        ) as pool:
+            futures = [pool.submit(run_session, i, page, seed, args.timeout) for i, page, seed in plan]
+            results = [future.result() for future in futures]
+        wall_time = time.perf_counter() - t0
+    finally:
+        if not args.keep_site:
+            shutil.rmtree(site_root, ignore_errors=True)
+
+    report = build_report(args, results, wall_time, setup_time)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    latency = report["latency_s"]
+    print(
+        f"{report['reruns']} reruns in {wall_time:.1f}s ({report['throughput_reruns_per_s']:.1f}/s); "
+        f"p50 {latency['p50']:.3f}s, p95 {latency['p95']:.3f}s, p99 {latency['p99']:.3f}s; "
+        f"total RSS {report['rss_mb']['total']:.0f} MiB; {len(report['errors'])} error(s)",
+        file=sys.stderr,
+    )
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
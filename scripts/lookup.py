@@ -0,0 +1,270 @@
+"""Streaming batch lookup over cuticulome.db for offline pipelines.
+
+Reads protein names (one per line) from files or stdin and resolves them
+case-insensitively against `proteins.name` in batches joined through a
+temporary table, so memory stays bounded by --batch-size. Matches are
+streamed to stdout in input order as TSV, JSON lines or FASTA.
+
+Filter flags follow the Database page: taxonomy filters are exact matches
+and --search is a case-insensitive substring match on any column.
+Unresolved or filtered-out names are reported on stderr.
+
+This module only needs the standard library (plus NumPy for packed
+sequences), so it starts without Streamlit, pandas or Plotly.
+
+Usage:
+    python scripts/lookup.py ids.txt --format tsv
+    cat ids.txt | python scripts/lookup.py --format fasta --seq-type cds
+    python scripts/lookup.py --all --order Diptera --search CPR --format jsonl
+"""
+
+import argparse
+import csv
+import json
+import sys
+from pathlib import Path
+
+from common import (
+    CSV_COLUMNS,
+    DB_PATH,
+    PROTEIN_COLUMNS,
+    connect,
+    has_packed_columns,
+    normalize_sequence,
+)
+
+TAXONOMY_FILTERS = ["subphylum", "class", "order", "family", "genus", "species"]
+SEQ_TYPES = ["protein", "cds"]
+FASTA_LINE_WIDTH = 70
+
+SELECT_COLUMNS = ", ".join(f'p."{column}"' for column in PROTEIN_COLUMNS)
+
+
+# --------------------
+# Input
+# --------------------
+def read_ids(paths):
+    """Yield IDs from the given files ("-" is stdin), skipping blank lines."""
+    for path in paths or ["-"]:
+        f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            for line in f:
+                value = line.strip()
+                if value and not value.startswith("#"):
+                    yield value
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# --------------------
+# Query building
+# --------------------
+def search_match(term, *values):
+    """Case-insensitive substring test used for --search (like the Database page)."""
+    return any(value is not None and term in str(value).casefold() for value in values)
+
+
+def build_filters(args):
+    clauses = []
+    params = []
+    for column in TAXONOMY_FILTERS:
+        value = getattr(args, column)
+        if value:
+            clauses.append(f'p."{column}" = ?')
+            params.append(value)
+    if args.search:
+        clauses.append(f"search_match(?, {SELECT_COLUMNS})")
+        params.append(args.search.casefold())
+    return clauses, params
+
+
+def fetch_sequences(conn, seq_types, packed):
+    """{(name, seq_type): sequence} for the proteins in temp table `hits`."""
+    placeholders = ", ".join("?" * len(seq_types))
+    if packed:
+        from seqpack import decode
+
+        rows = conn.execute(
+            f"""
+            SELECT s.protein_name, s.seq_type, s.encoding, s.length, s.packed, s.sequence
+            FROM sequences s JOIN hits h ON h.name = s.protein_name
+            WHERE s.seq_type IN ({placeholders})
+            ORDER BY s.id
+            """,
+            seq_types,
+        )
+        pairs = (((name, seq_type), decode(enc, length, blob, seq)) for name, seq_type, enc, length, blob, seq in rows)
+    else:
+        rows = conn.execute(
+            f"""
+            SELECT s.protein_name, s.seq_type, s.sequence
+            FROM sequences s JOIN hits h ON h.name = s.protein_name
+            WHERE s.seq_type IN ({placeholders})
+            ORDER BY s.id
+            """,
+            seq_types,
+        )
+        pairs = (((name, seq_type), normalize_sequence(seq or "")) for name, seq_type, seq in rows)
+
+    sequences = {}
+    for key, seq in pairs:
+        sequences.setdefault(key, seq)
+    return sequences
+
+
+# --------------------
+# Output
+# --------------------
+class Writer:
+    def __init__(self, fmt, seq_types, out):
+        self.fmt = fmt
+        self.seq_types = seq_types
+        self.out = out
+        self.headers = list(CSV_COLUMNS) + [f"{seq_type}_sequence" for seq_type in seq_types]
+        if fmt == "tsv":
+            self.tsv = csv.writer(out, delimiter="\t", lineterminator="\n")
+            self.tsv.writerow(["Query"] + self.headers)
+
+    def write(self, query, row, sequences):
+        values = [row[column] for column in PROTEIN_COLUMNS]
+        seqs = [sequences.get((row["name"], seq_type), "") for seq_type in self.seq_types]
+        if self.fmt == "tsv":
+            self.tsv.writerow([query] + ["" if v is None else v for v in values] + seqs)
+        elif self.fmt == "jsonl":
+            record = {"query": query}
+            record.update(zip(self.headers, values + seqs))
+            self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            for seq_type, seq in zip(self.seq_types, seqs):
+                if not seq:
+                    continue
+                self.out.write(f">{row['name']} {seq_type} [{row['species'] or ''}]\n")
+                for start in range(0, len(seq), FASTA_LINE_WIDTH):
+                    self.out.write(seq[start:start + FASTA_LINE_WIDTH] + "\n")
+
+
+# --------------------
+# Lookup
+# --------------------
+def run_batch(conn, writer, id_batch, offset, clauses, params, packed):
+    """Resolve one batch; returns the IDs that did not match."""
+    conn.execute("DELETE FROM query_ids")
+    conn.executemany(
+        "INSERT INTO query_ids (pos, id) VALUES (?, ?)",
+        ((offset + i, value) for i, value in enumerate(id_batch)),
+    )
+
+    # Exact names first, through the primary-key index on proteins.name
+    # (the left operand's BINARY collation applies). Leftovers are then
+    # matched with the NOCASE collation of query_ids.id, through its index.
+    filters = "".join(f" AND {clause}" for clause in clauses)
+    rows = []
+    for join in ("p.name = q.id", "q.id = p.name"):
+        rows += conn.execute(
+            f"""
+            SELECT q.pos, q.id, {SELECT_COLUMNS}
+            FROM query_ids q
+            JOIN proteins p ON {join}
+            WHERE 1 {filters}
+            """,
+            params,
+        ).fetchall()
+        conn.executemany("DELETE FROM query_ids WHERE pos = ?", ((row[0],) for row in rows))
+    rows.sort(key=lambda row: row[0])
+
+    found = {row[0] for row in rows}
+    records = [(query, dict(zip(PROTEIN_COLUMNS, values))) for _, query, *values in rows]
+    emit(conn, writer, records, packed)
+    return [value for i, value in enumerate(id_batch) if offset + i not in found]
+
+
+def run_all(conn, writer, args, clauses, params, packed):
+    """Stream every protein that passes the filters, in name order."""
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    cursor = conn.execute(f"SELECT {SELECT_COLUMNS} FROM proteins p {where} ORDER BY p.name", params)
+    while True:
+        chunk = cursor.fetchmany(args.batch_size)
+        if not chunk:
+            break
+        emit(conn, writer, [(values[0], dict(zip(PROTEIN_COLUMNS, values))) for values in chunk], packed)
+
+
+def emit(conn, writer, records, packed):
+    sequences = {}
+    if writer.seq_types and records:
+        conn.execute("DELETE FROM hits")
+        conn.executemany("INSERT OR IGNORE INTO hits (name) VALUES (?)", ((row["name"],) for _, row in records))
+        sequences = fetch_sequences(conn, writer.seq_types, packed)
+    for query, row in records:
+        writer.write(query, row, sequences)
+
+
+# --------------------
+# Entry point
+# --------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("ids", nargs="*", help="files with one protein name per line (default: stdin)")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--all", action="store_true", help="ignore IDs and stream every protein passing the filters")
+    parser.add_argument("--format", choices=["tsv", "jsonl", "fasta"], default="tsv")
+    parser.add_argument("--seq-type", choices=SEQ_TYPES + ["both"], help="sequences to include (FASTA default: protein)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="IDs resolved per query")
+    parser.add_argument("--search", help="case-insensitive substring match on any column")
+    for column in TAXONOMY_FILTERS:
+        parser.add_argument(f"--{column}", help=f"exact {column} match")
+    args = parser.parse_args(argv)
+
+    if args.seq_type == "both":
+        seq_types = SEQ_TYPES
+    elif args.seq_type:
+        seq_types = [args.seq_type]
+    else:
+        seq_types = ["protein"] if args.format == "fasta" else []
+
+    conn = connect(args.db)
+    missing = 0
+    try:
+        conn.create_function("search_match", len(PROTEIN_COLUMNS) + 1, search_match, deterministic=True)
+        conn.execute("CREATE TEMP TABLE query_ids (pos INTEGER PRIMARY KEY, id TEXT NOT NULL COLLATE NOCASE)")
+        conn.execute("CREATE INDEX temp.idx_query_ids_id ON query_ids (id)")
+        conn.execute("CREATE TEMP TABLE hits (name TEXT PRIMARY KEY)")
+        packed = has_packed_columns(conn)
+        clauses, params = build_filters(args)
+        writer = Writer(args.format, seq_types, sys.stdout)
+
+        if args.all:
+            run_all(conn, writer, args, clauses, params, packed)
+        else:
+            offset = 0
+            for id_batch in batches(read_ids(args.ids), args.batch_size):
+                for value in run_batch(conn, writer, id_batch, offset, clauses, params, packed):
+                    missing += 1
+                    print(f"not found: {value}", file=sys.stderr)
+                offset += len(id_batch)
+    except BrokenPipeError:
+        # Downstream closed the pipe (e.g. `| head`); stop quietly
+        sys.stderr.close()
+        return 0
+    finally:
+        conn.close()
+
+    if missing:
+        print(f"{missing} ID(s) not found or filtered out", file=sys.stderr)
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
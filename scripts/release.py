@@ -0,0 +1,383 @@
+"""Versioned releases and delta exports.
+
+`create` records a release in `cuticulome.db`. It compares the current
+`proteins` and `sequences` tables with the state at the previous release and
+appends one row per added, modified or removed entry to `protein_history`
+and `sequence_history`. History rows hold the full protein record or the
+packed sequence (see seqpack.py), so the state at any release can be
+rebuilt.
+
+`delta` writes a ZIP with only the entries that differ between two
+releases:
+    delta.csv          added and modified proteins (export column headers)
+    protein.fasta      added and modified protein sequences
+    cds.fasta          added and modified CDS
+    tombstones.tsv     removed proteins and sequences
+    manifest.json      versions and counts
+
+Usage:
+    python scripts/release.py create 0.2 [--notes "..."]
+    python scripts/release.py list
+    python scripts/release.py delta --from 0.1 --to 0.2 --output delta.zip
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import sys
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from common import CSV_COLUMNS, DB_PATH, connect, iter_sequences
+from seqpack import decode, encode
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS releases (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    version TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    notes TEXT
+);
+CREATE TABLE IF NOT EXISTS protein_history (
+    release_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    change TEXT NOT NULL,
+    row_sha1 TEXT,
+    data TEXT,
+    PRIMARY KEY (release_id, name),
+    FOREIGN KEY (release_id) REFERENCES releases(id)
+);
+CREATE TABLE IF NOT EXISTS sequence_history (
+    release_id INTEGER NOT NULL,
+    protein_name TEXT NOT NULL,
+    seq_type TEXT NOT NULL,
+    change TEXT NOT NULL,
+    seq_sha1 TEXT,
+    encoding TEXT,
+    length INTEGER,
+    packed BLOB,
+    sequence TEXT,
+    PRIMARY KEY (release_id, protein_name, seq_type),
+    FOREIGN KEY (release_id) REFERENCES releases(id)
+);
+"""
+
+FASTA_LINE_WIDTH = 70
+
+
+def sha1(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def row_digest(row):
+    return sha1(json.dumps(row, sort_keys=True, ensure_ascii=False))
+
+
+# --------------------
+# Release lookup
+# --------------------
+def release_id(conn, version):
+    row = conn.execute("SELECT id FROM releases WHERE version = ?", (version,)).fetchone()
+    if row is None:
+        raise SystemExit(f"Unknown release: {version}")
+    return row[0]
+
+
+def latest_release(conn):
+    return conn.execute(
+        "SELECT id, version FROM releases ORDER BY id DESC LIMIT 1"
+    ).fetchone()
+
+
+# --------------------
+# State at a release
+# --------------------
+def protein_state(conn, rid):
+    """{name: (row_sha1, data)} for proteins present at release rid."""
+    if rid is None:
+        return {}
+    rows = conn.execute(
+        """
+        SELECT h.name, h.change, h.row_sha1, h.data
+        FROM protein_history h
+        JOIN (
+            SELECT name, MAX(release_id) AS release_id
+            FROM protein_history
+            WHERE release_id <= ?
+            GROUP BY name
+        ) latest ON latest.name = h.name AND latest.release_id = h.release_id
+        """,
+        (rid,),
+    )
+    return {name: (digest, data) for name, change, digest, data in rows if change != "removed"}
+
+
+def sequence_state(conn, rid):
+    """{(protein_name, seq_type): (seq_sha1, history release_id)} at release rid.
+
+    Sequences themselves are not read; see load_sequences.
+    """
+    if rid is None:
+        return {}
+    rows = conn.execute(
+        """
+        SELECT h.protein_name, h.seq_type, h.change, h.seq_sha1, h.release_id
+        FROM sequence_history h
+        JOIN (
+            SELECT protein_name, seq_type, MAX(release_id) AS release_id
+            FROM sequence_history
+            WHERE release_id <= ?
+            GROUP BY protein_name, seq_type
+        ) latest ON latest.protein_name = h.protein_name
+                AND latest.seq_type = h.seq_type
+                AND latest.release_id = h.release_id
+        """,
+        (rid,),
+    )
+    return {
+        (name, seq_type): (digest, history_id)
+        for name, seq_type, change, digest, history_id in rows
+        if change != "removed"
+    }
+
+
+def load_sequences(conn, state, keys):
+    """Decode the sequences of the given keys of a sequence_state().
+
+    Each one is a primary-key lookup into sequence_history, so the cost
+    follows the number of keys, not the size of the database.
+    """
+    sequences = {}
+    for name, seq_type in keys:
+        encoding, length, packed, sequence = conn.execute(
+            """
+            SELECT encoding, length, packed, sequence
+            FROM sequence_history
+            WHERE release_id = ? AND protein_name = ? AND seq_type = ?
+            """,
+            (state[(name, seq_type)][1], name, seq_type),
+        ).fetchone()
+        sequences[(name, seq_type)] = decode(encoding, length, packed, sequence)
+    return sequences
+
+
+def current_state(conn):
+    cursor = conn.execute("SELECT * FROM proteins")
+    columns = [d[0] for d in cursor.description]
+    proteins = {}
+    for values in cursor:
+        row = dict(zip(columns, values))
+        proteins[row["name"]] = row
+
+    sequences = {}
+    for name, seq_type, seq in iter_sequences(conn):
+        sequences.setdefault((name, seq_type), seq)
+    return proteins, sequences
+
+
+def classify(old_keys, new_keys, changed):
+    """Split keys into added, modified and removed."""
+    added = sorted(new_keys - old_keys)
+    removed = sorted(old_keys - new_keys)
+    modified = sorted(key for key in old_keys & new_keys if changed(key))
+    return added, modified, removed
+
+
+# --------------------
+# Commands
+# --------------------
+def create_release(conn, version, notes):
+    conn.executescript(SCHEMA)
+    if conn.execute("SELECT 1 FROM releases WHERE version = ?", (version,)).fetchone():
+        raise SystemExit(f"Release {version} already exists")
+
+    previous = latest_release(conn)
+    previous_id = previous[0] if previous else None
+    old_proteins = protein_state(conn, previous_id)
+    old_sequences = sequence_state(conn, previous_id)
+
+    proteins, sequences = current_state(conn)
+    protein_digests = {name: row_digest(row) for name, row in proteins.items()}
+    sequence_digests = {key: sha1(seq) for key, seq in sequences.items()}
+
+    p_added, p_modified, p_removed = classify(
+        set(old_proteins), set(proteins),
+        lambda name: old_proteins[name][0] != protein_digests[name],
+    )
+    s_added, s_modified, s_removed = classify(
+        set(old_sequences), set(sequences),
+        lambda key: old_sequences[key][0] != sequence_digests[key],
+    )
+
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO releases (version, created_at, notes) VALUES (?, ?, ?)",
+            (version, datetime.now(timezone.utc).isoformat(timespec="seconds"), notes),
+        )
+        rid = cursor.lastrowid
+
+        protein_rows = [
+            (rid, name, change, protein_digests[name], json.dumps(proteins[name], ensure_ascii=False))
+            for change, names in (("added", p_added), ("modified", p_modified))
+            for name in names
+        ]
+        protein_rows += [(rid, name, "removed", None, None) for name in p_removed]
+        conn.executemany("INSERT INTO protein_history VALUES (?, ?, ?, ?, ?)", protein_rows)
+
+        sequence_rows = []
+        for change, keys in (("added", s_added), ("modified", s_modified)):
+            for name, seq_type in keys:
+                seq = sequences[(name, seq_type)]
+                encoding, length, packed = encode(seq, seq_type)
+                text = seq if encoding == "text" else None
+                sequence_rows.append((
+                    rid, name, seq_type, change, sequence_digests[(name, seq_type)],
+                    encoding, length, packed, text,
+                ))
+        sequence_rows += [
+            (rid, name, seq_type, "removed", None, None, None, None, None)
+            for name, seq_type in s_removed
+        ]
+        conn.executemany(
+            "INSERT INTO sequence_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", sequence_rows
+        )
+
+    print(
+        f"Release {version}: proteins +{len(p_added)} ~{len(p_modified)} -{len(p_removed)}, "
+        f"sequences +{len(s_added)} ~{len(s_modified)} -{len(s_removed)}",
+        file=sys.stderr,
+    )
+
+
+def list_releases(conn, out):
+    conn.executescript(SCHEMA)
+    rows = conn.execute(
+        """
+        SELECT r.version, r.created_at,
+               (SELECT COUNT(*) FROM protein_history h WHERE h.release_id = r.id),
+               (SELECT COUNT(*) FROM sequence_history h WHERE h.release_id = r.id),
+               COALESCE(r.notes, '')
+        FROM releases r
+        ORDER BY r.id
+        """
+    )
+    out.write("version\tcreated_at\tprotein_changes\tsequence_changes\tnotes\n")
+    for row in rows:
+        out.write("\t".join(str(value) for value in row) + "\n")
+
+
+def write_fasta(entries):
+    buffer = io.StringIO()
+    for name, change, seq in entries:
+        buffer.write(f">{name} {change}\n")
+        for start in range(0, len(seq), FASTA_LINE_WIDTH):
+            buffer.write(seq[start:start + FASTA_LINE_WIDTH] + "\n")
+    return buffer.getvalue()
+
+
+def write_delta(conn, from_version, to_version, output):
+    conn.executescript(SCHEMA)
+    from_id = release_id(conn, from_version) if from_version else None
+    if to_version:
+        to_id = release_id(conn, to_version)
+    else:
+        latest = latest_release(conn)
+        if latest is None:
+            raise SystemExit("No releases recorded yet; run 'create' first")
+        to_id, to_version = latest
+    if from_id is not None and from_id >= to_id:
+        raise SystemExit("--from must be an earlier release than --to")
+
+    old_proteins = protein_state(conn, from_id)
+    new_proteins = protein_state(conn, to_id)
+    old_sequences = sequence_state(conn, from_id)
+    new_sequences = sequence_state(conn, to_id)
+
+    p_added, p_modified, p_removed = classify(
+        set(old_proteins), set(new_proteins),
+        lambda name: old_proteins[name][0] != new_proteins[name][0],
+    )
+    s_added, s_modified, s_removed = classify(
+        set(old_sequences), set(new_sequences),
+        lambda key: old_sequences[key][0] != new_sequences[key][0],
+    )
+    sequences = load_sequences(conn, new_sequences, s_added + s_modified)
+
+    csv_buffer = io.StringIO()
+    writer = csv.writer(csv_buffer)
+    writer.writerow(["Change"] + list(CSV_COLUMNS))
+    for change, names in (("added", p_added), ("modified", p_modified)):
+        for name in names:
+            row = json.loads(new_proteins[name][1])
+            writer.writerow([change] + [row.get(column) or "" for column in CSV_COLUMNS.values()])
+
+    fasta = {"protein": [], "cds": []}
+    for change, keys in (("added", s_added), ("modified", s_modified)):
+        for name, seq_type in keys:
+            fasta.setdefault(seq_type, []).append((name, change, sequences[(name, seq_type)]))
+
+    tombstones = ["kind\tprotein_name\tseq_type"]
+    tombstones += [f"protein\t{name}\t" for name in p_removed]
+    tombstones += [f"sequence\t{name}\t{seq_type}" for name, seq_type in s_removed]
+
+    manifest = {
+        "from": from_version,
+        "to": to_version,
+        "proteins": {"added": len(p_added), "modified": len(p_modified), "removed": len(p_removed)},
+        "sequences": {"added": len(s_added), "modified": len(s_modified), "removed": len(s_removed)},
+    }
+
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr("delta.csv", csv_buffer.getvalue())
+        for seq_type, entries in sorted(fasta.items()):
+            zipf.writestr(f"{seq_type}.fasta", write_fasta(entries))
+        zipf.writestr("tombstones.tsv", "\n".join(tombstones) + "\n")
+        zipf.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    print(
+        f"Delta {from_version or '(empty)'} -> {to_version}: "
+        f"proteins +{len(p_added)} ~{len(p_modified)} -{len(p_removed)}, "
+        f"sequences +{len(s_added)} ~{len(s_modified)} -{len(s_removed)}",
+        file=sys.stderr,
+    )
+
+
+# --------------------
+# Entry point
+# --------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="record the current tables as a new release")
+    create.add_argument("version")
+    create.add_argument("--notes")
+
+    commands.add_parser("list", help="list recorded releases")
+
+    delta = commands.add_parser("delta", help="export the changes between two releases")
+    delta.add_argument("--from", dest="from_version", help="base release (default: empty database)")
+    delta.add_argument("--to", dest="to_version", help="target release (default: latest)")
+    delta.add_argument("--output", type=Path, required=True)
+
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    try:
+        if args.command == "create":
+            create_release(conn, args.version, args.notes)
+        elif args.command == "list":
+            list_releases(conn, sys.stdout)
+        else:
+            write_delta(conn, args.from_version, args.to_version, args.output)
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
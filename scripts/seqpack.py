@@ -0,0 +1,235 @@
+"""Compact binary storage for the `sequences` table.
+
+Sequences are stored in three columns next to the legacy `sequence` TEXT:
+`encoding`, `length` (residues) and `packed` (BLOB).
+
+- `2bit`: nucleotides, four per byte (A=0, C=1, G=2, T=3), followed by
+  an exception list of (start, run length, byte) runs for N and other
+  ambiguity codes;
+- `5bit`: protein residues from common.PROTEIN_ALPHABET, bit-packed;
+- `zstd`: ASCII compressed with zstandard (optional dependency);
+- `text`: sequence kept in the `sequence` column, `packed` is NULL.
+
+Decoding goes through NumPy views of the stored bytes and returns uint8
+arrays of ASCII codes, so callers only build Python strings when they need
+them.
+
+Usage:
+    python scripts/seqpack.py [--protein-codec 5bit|zstd] [--unpack]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from common import DB_PATH, PROTEIN_ALPHABET, connect, has_packed_columns, normalize_sequence
+
+try:
+    import zstandard
+except ImportError:  # optional: only needed for the zstd protein codec
+    zstandard = None
+
+NUCLEOTIDES = b"ACGT"
+
+# Exception runs appended to 2-bit data: start, length, ASCII byte
+RUN_DTYPE = np.dtype([("start", "<u4"), ("length", "<u4"), ("byte", "u1")])
+
+NUCLEOTIDE_CODES = np.full(256, 255, dtype=np.uint8)
+NUCLEOTIDE_CODES[np.frombuffer(NUCLEOTIDES, dtype=np.uint8)] = np.arange(4, dtype=np.uint8)
+NUCLEOTIDE_BYTES = np.frombuffer(NUCLEOTIDES, dtype=np.uint8)
+
+PROTEIN_CODES = np.full(256, 255, dtype=np.uint8)
+PROTEIN_BYTES = np.frombuffer(PROTEIN_ALPHABET.encode("ascii"), dtype=np.uint8)
+PROTEIN_CODES[PROTEIN_BYTES] = np.arange(len(PROTEIN_BYTES), dtype=np.uint8)
+
+ZSTD_LEVEL = 19
+
+
+def as_array(seq):
+    """View a str/bytes sequence as a uint8 array of ASCII codes."""
+    if isinstance(seq, str):
+        seq = seq.encode("ascii", "replace")
+    return np.frombuffer(seq, dtype=np.uint8)
+
+
+# --------------------
+# 2-bit nucleotides
+# --------------------
+def pack_2bit(seq):
+    ascii_codes = as_array(seq)
+    codes = NUCLEOTIDE_CODES[ascii_codes]
+    other = codes == 255
+
+    runs = np.empty(0, dtype=RUN_DTYPE)
+    if other.any():
+        # Group consecutive identical non-ACGT bytes into runs
+        positions = np.flatnonzero(other)
+        values = ascii_codes[positions]
+        breaks = np.flatnonzero((np.diff(positions) != 1) | (np.diff(values) != 0)) + 1
+        starts = np.concatenate(([0], breaks))
+        ends = np.concatenate((breaks, [len(positions)]))
+        runs = np.empty(len(starts), dtype=RUN_DTYPE)
+        runs["start"] = positions[starts]
+        runs["length"] = ends - starts
+        runs["byte"] = values[starts]
+        codes = np.where(other, 0, codes)
+
+    padded = np.zeros(-(-len(codes) // 4) * 4, dtype=np.uint8)
+    padded[: len(codes)] = codes
+    quads = padded.reshape(-1, 4)
+    packed = (quads[:, 0] << 6) | (quads[:, 1] << 4) | (quads[:, 2] << 2) | quads[:, 3]
+    return packed.tobytes() + runs.tobytes()
+
+
+def unpack_2bit(blob, length):
+    data = np.frombuffer(blob, dtype=np.uint8)
+    n_packed = -(-length // 4)
+    packed = data[:n_packed]
+    codes = np.empty((n_packed, 4), dtype=np.uint8)
+    for i, shift in enumerate((6, 4, 2, 0)):
+        codes[:, i] = (packed >> shift) & 3
+    seq = NUCLEOTIDE_BYTES[codes.reshape(-1)[:length]]
+
+    runs = np.frombuffer(data[n_packed:], dtype=RUN_DTYPE)
+    for start, run_length, byte in runs.tolist():
+        seq[start : start + run_length] = byte
+    return seq
+
+
+# --------------------
+# 5-bit proteins
+# --------------------
+def can_pack_5bit(seq):
+    return bool((PROTEIN_CODES[as_array(seq)] != 255).all())
+
+
+def pack_5bit(seq):
+    codes = PROTEIN_CODES[as_array(seq)]
+    bits = np.unpackbits(codes[:, None], axis=1)[:, 3:]
+    return np.packbits(bits.reshape(-1)).tobytes()
+
+
+def unpack_5bit(blob, length):
+    bits = np.unpackbits(np.frombuffer(blob, dtype=np.uint8))[: length * 5].reshape(length, 5)
+    codes = bits @ np.array([16, 8, 4, 2, 1], dtype=np.uint8)
+    return PROTEIN_BYTES[codes]
+
+
+# --------------------
+# Dispatch
+# --------------------
+def encode(seq, seq_type, protein_codec="5bit"):
+    """Return (encoding, length, packed) for a normalized sequence."""
+    length = len(seq)
+    if not seq.isascii():
+        # Neither codec round-trips non-ASCII text; keep it as is
+        return "text", length, None
+    if seq_type == "cds":
+        return "2bit", length, pack_2bit(seq)
+    if seq_type == "protein":
+        if protein_codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("the zstd codec needs the 'zstandard' package")
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+            return "zstd", length, compressor.compress(seq.encode("ascii"))
+        if can_pack_5bit(seq):
+            return "5bit", length, pack_5bit(seq)
+    return "text", length, None
+
+
+def decode_array(encoding, length, packed, sequence=None):
+    """Decode one stored sequence to a uint8 array of ASCII codes."""
+    if encoding is None or encoding == "text":
+        return as_array(normalize_sequence(sequence or ""))
+    if encoding == "2bit":
+        return unpack_2bit(packed, length)
+    if encoding == "5bit":
+        return unpack_5bit(packed, length)
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("decoding zstd sequences needs the 'zstandard' package")
+        return np.frombuffer(zstandard.ZstdDecompressor().decompress(packed), dtype=np.uint8)
+    raise ValueError(f"Unknown sequence encoding: {encoding}")
+
+
+def decode(encoding, length, packed, sequence=None):
+    """Decode one stored sequence to a str."""
+    if encoding is None or encoding == "text":
+        return normalize_sequence(sequence or "")
+    return decode_array(encoding, length, packed).tobytes().decode("ascii")
+
+
+# --------------------
+# Migration
+# --------------------
+def add_packed_columns(conn):
+    if not has_packed_columns(conn):
+        conn.execute("ALTER TABLE sequences ADD COLUMN encoding TEXT")
+        conn.execute("ALTER TABLE sequences ADD COLUMN length INTEGER")
+        conn.execute("ALTER TABLE sequences ADD COLUMN packed BLOB")
+
+
+def pack_table(conn, protein_codec):
+    """Re-encode every row; returns the number of rows changed."""
+    rows = conn.execute(
+        "SELECT id, seq_type, sequence, encoding, length, packed FROM sequences"
+    ).fetchall()
+    updates = []
+    for row_id, seq_type, sequence, encoding, length, packed in rows:
+        seq = decode(encoding, length, packed, sequence)
+        new_encoding, new_length, new_packed = encode(seq, seq_type, protein_codec)
+        if new_encoding == encoding:
+            continue
+        text = seq if new_encoding == "text" else None
+        updates.append((text, new_encoding, new_length, new_packed, row_id))
+    conn.executemany(
+        "UPDATE sequences SET sequence = ?, encoding = ?, length = ?, packed = ? WHERE id = ?",
+        updates,
+    )
+    return len(updates)
+
+
+def unpack_table(conn):
+    rows = conn.execute(
+        "SELECT id, encoding, length, packed, sequence FROM sequences WHERE encoding IS NOT 'text'"
+    ).fetchall()
+    conn.executemany(
+        "UPDATE sequences SET sequence = ?, encoding = 'text', packed = NULL WHERE id = ?",
+        [(decode(encoding, length, packed, sequence), row_id) for row_id, encoding, length, packed, sequence in rows],
+    )
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--protein-codec", choices=["5bit", "zstd"], default="5bit")
+    parser.add_argument("--unpack", action="store_true", help="convert every row back to plain TEXT")
+    args = parser.parse_args(argv)
+
+    size_before = args.db.stat().st_size
+    conn = connect(args.db)
+    try:
+        with conn:
+            add_packed_columns(conn)
+            changed = unpack_table(conn) if args.unpack else pack_table(conn, args.protein_codec)
+        conn.execute("VACUUM")
+        counts = conn.execute(
+            "SELECT seq_type, encoding, COUNT(*) FROM sequences GROUP BY 1, 2 ORDER BY 1, 2"
+        ).fetchall()
+    finally:
+        conn.close()
+
+    print(
+        f"{changed} row(s) re-encoded; "
+        + ", ".join(f"{seq_type}/{encoding}: {n}" for seq_type, encoding, n in counts)
+        + f"; {size_before / 1024:.0f} KiB -> {args.db.stat().st_size / 1024:.0f} KiB",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())